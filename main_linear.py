@@ -28,9 +28,16 @@ from pytorch_lightning.loggers import WandbLogger
 from pytorch_lightning.strategies.ddp import DDPStrategy
 from timm.data.mixup import Mixup
 from timm.loss import LabelSmoothingCrossEntropy, SoftTargetCrossEntropy
+from torch.utils.data import DataLoader
 
 from solo.args.setup import parse_args_linear
-from solo.data.classification_dataloader import prepare_data
+from solo.data.classification_dataloader import (
+    channels_last_collate,
+    prepare_data,
+    prepare_dataloaders,
+    prepare_datasets,
+    prepare_transforms,
+)
 from solo.methods.base import BaseMethod
 from solo.methods.linear import LinearModel
 from solo.utils.auto_resumer import AutoResumer
@@ -130,8 +137,58 @@ def main():
         batch_size=args.batch_size,
         num_workers=args.num_workers,
         auto_augment=args.auto_augment,
+        channels_last=model.use_channels_last,
     )
 
+    # run the frozen backbone only once and train the classifier over the cached features
+    if args.cache_features:
+        assert args.data_format != "dali", "Caching features is not supported with Dali."
+        # features are extracted before the trainer spawns the other processes,
+        # so each of them would go through all the data again on the same device
+        assert (
+            len(args.devices) == 1 and (args.num_nodes or 1) == 1
+        ), "Caching features is only supported with a single device."
+
+        # features are extracted without random augmentations
+        _, T_val = prepare_transforms(args.dataset)
+        train_dataset, _ = prepare_datasets(
+            args.dataset,
+            T_val,
+            T_val,
+            train_data_path=args.train_data_path,
+            val_data_path=args.val_data_path,
+            data_format=val_data_format,
+        )
+        train_extraction_loader = DataLoader(
+            train_dataset,
+            batch_size=args.batch_size,
+            num_workers=args.num_workers,
+            pin_memory=True,
+            collate_fn=channels_last_collate if model.use_channels_last else None,
+        )
+
+        if args.features_cache_dir is not None:
+            os.makedirs(args.features_cache_dir, exist_ok=True)
+            train_cache_file = os.path.join(args.features_cache_dir, "train")
+            val_cache_file = os.path.join(args.features_cache_dir, "val")
+        else:
+            train_cache_file = val_cache_file = None
+
+        model.to(
+            torch.device("cuda", args.devices[0])
+            if torch.cuda.is_available()
+            else torch.device("cpu")
+        )
+        train_feats = model.precompute_features(train_extraction_loader, train_cache_file)
+        val_feats = model.precompute_features(val_loader, val_cache_file)
+        model.cpu()
+
+        # features are already in memory, so there is no need for extra workers
+        train_loader, val_loader = prepare_dataloaders(
+            train_feats, val_feats, batch_size=args.batch_size, num_workers=0
+        )
+        model.features_cached = True
+
     if args.data_format == "dali":
         assert (
             _dali_avaliable
@@ -298,7 +298,7 @@ def additional_setup_linear(args: Namespace):
     elif args.optimizer == "lars":
         args.extra_optimizer_args["momentum"] = 0.9
         args.extra_optimizer_args["exclude_bias_n_norm"] = args.exclude_bias_n_norm_lars
-    elif args.optimizer == "adamw":
+    elif args.optimizer in ["adam", "adamw"]:
         args.extra_optimizer_args["betas"] = [args.adamw_beta1, args.adamw_beta2]
 
     with suppress(AttributeError):
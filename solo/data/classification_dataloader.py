@@ -19,13 +19,15 @@
 
 import os
 from pathlib import Path
-from typing import Callable, Optional, Tuple, Union
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 
+import torch
 import torchvision
 from timm.data import create_transform
 from timm.data.constants import IMAGENET_DEFAULT_MEAN, IMAGENET_DEFAULT_STD
 from torch import nn
 from torch.utils.data import DataLoader, Dataset
+from torch.utils.data.dataloader import default_collate
 from torchvision import transforms
 from torchvision.datasets import STL10, ImageFolder
 
@@ -242,8 +244,27 @@ def prepare_datasets(
     return train_dataset, val_dataset
 
 
+def channels_last_collate(batch: Sequence[Any]) -> List[Any]:
+    """Collates a batch of images and targets and converts the images to channels last.
+    This way, the conversion runs on the dataloader workers instead of on the training step.
+
+    Args:
+        batch (Sequence[Any]): list of samples containing an image and its target.
+
+    Returns:
+        List[Any]: batched images in channels last and batched targets.
+    """
+
+    X, *rest = default_collate(batch)
+    return [X.contiguous(memory_format=torch.channels_last), *rest]
+
+
 def prepare_dataloaders(
-    train_dataset: Dataset, val_dataset: Dataset, batch_size: int = 64, num_workers: int = 4
+    train_dataset: Dataset,
+    val_dataset: Dataset,
+    batch_size: int = 64,
+    num_workers: int = 4,
+    channels_last: bool = False,
 ) -> Tuple[DataLoader, DataLoader]:
     """Wraps a train and a validation dataset with a DataLoader.
 
@@ -252,10 +273,16 @@ def prepare_dataloaders(
         val_dataset (Dataset): object containing validation data.
         batch_size (int): batch size.
         num_workers (int): number of parallel workers.
+        channels_last (bool): converts the images to channels last while collating.
+            Defaults to False.
     Returns:
         Tuple[DataLoader, DataLoader]: training dataloader and validation dataloader.
     """
 
+    collate_fn = channels_last_collate if channels_last else None
+    # keeps the workers alive between epochs instead of forking them again every epoch
+    persistent_workers = num_workers > 0
+
     train_loader = DataLoader(
         train_dataset,
         batch_size=batch_size,
@@ -263,6 +290,8 @@ def prepare_dataloaders(
         num_workers=num_workers,
         pin_memory=True,
         drop_last=True,
+        collate_fn=collate_fn,
+        persistent_workers=persistent_workers,
     )
     val_loader = DataLoader(
         val_dataset,
@@ -270,6 +299,8 @@ def prepare_dataloaders(
         num_workers=num_workers,
         pin_memory=True,
         drop_last=False,
+        collate_fn=collate_fn,
+        persistent_workers=persistent_workers,
     )
     return train_loader, val_loader
 
@@ -284,6 +315,7 @@ def prepare_data(
     download: bool = True,
     data_fraction: float = -1.0,
     auto_augment: bool = False,
+    channels_last: bool = False,
 ) -> Tuple[DataLoader, DataLoader]:
     """Prepares transformations, creates dataset objects and wraps them in dataloaders.
 
@@ -301,6 +333,8 @@ def prepare_data(
             Defaults to -1.0.
         auto_augment (bool, optional): use auto augment following timm.data.create_transform.
             Defaults to False.
+        channels_last (bool, optional): converts the images to channels last while collating.
+            Defaults to False.
 
     Returns:
         Tuple[DataLoader, DataLoader]: prepared training and validation dataloader.
@@ -336,5 +370,6 @@ def prepare_data(
         val_dataset,
         batch_size=batch_size,
         num_workers=num_workers,
+        channels_last=channels_last,
     )
     return train_loader, val_loader
@@ -17,20 +17,91 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import contextlib
 import logging
+import os
 from argparse import ArgumentParser
-from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pytorch_lightning as pl
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from pl_bolts.optimizers.lr_scheduler import LinearWarmupCosineAnnealingLR
+from pytorch_lightning.strategies import DataParallelStrategy
 from solo.methods.base import BaseMethod
 from solo.utils.lars import LARS
-from solo.utils.metrics import accuracy_at_k, weighted_mean
+from solo.utils.metrics import weighted_means
 from solo.utils.misc import param_groups_layer_decay, remove_bias_and_norm_from_weight_decay
+from timm.loss import SoftTargetCrossEntropy
 from torch.optim.lr_scheduler import ExponentialLR, MultiStepLR, ReduceLROnPlateau
+from torch.utils.data import DataLoader, TensorDataset
+
+
+def _loss_and_topk(
+    logits: torch.Tensor, target: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Computes the cross-entropy loss and the accuracies @1 and @5 with a single log-softmax
+    over the logits, instead of traversing them once for the loss and again for the accuracies.
+
+    Args:
+        logits (torch.Tensor): output of the classifier.
+        target (torch.Tensor): ground truth labels or soft targets (e.g. from mixup/cutmix).
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: loss, accuracy @1 and accuracy @5.
+    """
+
+    batch_size = target.size(0)
+
+    logp = F.log_softmax(logits, dim=-1)
+    if target.ndim == 2:
+        # soft targets, accuracies are computed over their most likely class
+        loss = -(target * logp).sum(dim=-1).mean()
+        target = target.argmax(dim=1)
+    else:
+        loss = -logp.gather(1, target.unsqueeze(1)).mean()
+
+    with torch.no_grad():
+        _, pred = logp.topk(5, dim=1)
+        correct = pred.eq(target.unsqueeze(1))
+        acc1 = correct[:, :1].reshape(-1).float().sum(0, keepdim=True).mul_(100.0 / batch_size)
+        acc5 = correct.reshape(-1).float().sum(0, keepdim=True).mul_(100.0 / batch_size)
+
+    return loss, acc1, acc5
+
+
+def _has_sync_batchnorm(module: nn.Module) -> bool:
+    """Checks if a module contains any SyncBatchNorm layer.
+
+    Args:
+        module (nn.Module): module to check.
+
+    Returns:
+        bool: whether the module has SyncBatchNorm layers.
+    """
+
+    return any(isinstance(m, nn.SyncBatchNorm) for m in module.modules())
+
+
+def _should_use_channels_last(backbone: nn.Module) -> bool:
+    """Checks if channels last is expected to speed up the backbone. This requires a GPU with
+    tensor cores (compute capability >= 7.0) and a backbone without SyncBatchNorm layers,
+    otherwise the conversion usually slows training down.
+
+    Args:
+        backbone (nn.Module): backbone architecture.
+
+    Returns:
+        bool: whether channels last should be used.
+    """
+
+    return (
+        torch.cuda.is_available()
+        and torch.cuda.get_device_capability()[0] >= 7
+        and not _has_sync_batchnorm(backbone)
+    )
 
 
 class LinearModel(pl.LightningModule):
@@ -68,6 +139,9 @@ class LinearModel(pl.LightningModule):
         scheduler_interval: str = "step",
         lr_decay_steps: Optional[Sequence[int]] = None,
         no_channel_last: bool = False,
+        compile_head: bool = False,
+        quantize_backbone: bool = False,
+        backbone_bf16: bool = False,
         **kwargs,
     ):
         """Implements linear evaluation.
@@ -92,8 +166,16 @@ class LinearModel(pl.LightningModule):
             lr_decay_steps (Optional[Sequence[int]], optional): list of epochs where the learning
                 rate will be decreased. Defaults to None.
             no_channel_last (bool). Disables channel last conversion operation which
-                speeds up training considerably. Defaults to False.
+                speeds up training considerably. Even if not disabled, it is only used on GPUs
+                with tensor cores and without SyncBatchNorm or DataParallel. Defaults to False.
                 https://pytorch.org/tutorials/intermediate/memory_format_tutorial.html#converting-existing-models
+            compile_head (bool). Compiles the classifier together with the loss and accuracies
+                with torch.compile, fusing them into fewer kernels. Requires torch>=2.0.
+                Defaults to False.
+            quantize_backbone (bool). Quantizes the linear layers of a frozen backbone to int8
+                when running on CPU. Defaults to False.
+            backbone_bf16 (bool). Runs a frozen backbone in bf16 on GPUs that support it,
+                regardless of the trainer's precision. Defaults to False.
         """
 
         super().__init__()
@@ -103,15 +185,26 @@ class LinearModel(pl.LightningModule):
             features_dim = self.backbone.inplanes
         else:
             features_dim = self.backbone.num_features
+        self.features_dim = features_dim
         self.classifier = nn.Linear(features_dim, num_classes)  # type: ignore
 
         if loss_func is None:
             loss_func = nn.CrossEntropyLoss()
         self.loss_func = loss_func
+        # plain mean cross-entropy (also over soft targets) is computed together with the
+        # accuracies, any other configuration of the loss uses loss_func directly
+        self._fused_loss = isinstance(loss_func, SoftTargetCrossEntropy) or (
+            type(loss_func) is nn.CrossEntropyLoss
+            and loss_func.weight is None
+            and loss_func.reduction == "mean"
+            and loss_func.ignore_index == -100
+            and getattr(loss_func, "label_smoothing", 0.0) == 0.0
+        )
 
         # training related
         self.max_epochs = max_epochs
         self.batch_size = batch_size
+        assert optimizer in self._OPTIMIZERS, f"{optimizer} not in {list(self._OPTIMIZERS)}"
         self.optimizer = optimizer
         self.lr = lr
         self.weight_decay = weight_decay
@@ -125,14 +218,35 @@ class LinearModel(pl.LightningModule):
         assert scheduler_interval in ["step", "epoch"]
         self.scheduler_interval = scheduler_interval
         self.lr_decay_steps = lr_decay_steps
+        self._sched_lengths = None
         self.no_channel_last = no_channel_last
+        assert not (quantize_backbone and finetune), "Only frozen backbones can be quantized."
+        self.quantize_backbone = quantize_backbone
+        self._backbone_quantized = False
+        # set once the dataloaders yield features from precompute_features instead of images
+        self.features_cached = False
 
         # all the other parameters
         self.extra_args = kwargs
 
+        # if accumulating gradient then scale lr
+        accumulate_grad_batches = self.extra_args.get("accumulate_grad_batches", None)
+        if isinstance(accumulate_grad_batches, int) and accumulate_grad_batches > 1:
+            self.lr = self.lr * accumulate_grad_batches
+            self.min_lr = self.min_lr * accumulate_grad_batches
+            self.warmup_start_lr = self.warmup_start_lr * accumulate_grad_batches
+
         if not finetune:
             for param in self.backbone.parameters():
                 param.requires_grad = False
+            # frozen backbones are always kept in eval mode (see train)
+            self.backbone.eval()
+
+        # frozen backbones can run in bf16, unless SyncBatchNorm is used
+        self.backbone_bf16 = backbone_bf16
+        self._backbone_bf16 = (
+            backbone_bf16 and not finetune and not _has_sync_batchnorm(self.backbone)
+        )
 
         if scheduler_interval == "step":
             logging.warn(
@@ -140,10 +254,27 @@ class LinearModel(pl.LightningModule):
                 "issues when resuming a checkpoint."
             )
 
-        # can provide up to ~20% speed up
-        if not no_channel_last:
+        # can provide up to ~20% speed up, but only on supported setups.
+        # SyncBatchNorm and DataParallel are only set up later by the trainer, so their flags are
+        # checked here as well, since the dataloaders are built based on this decision
+        strategy = self.extra_args.get("strategy", None)
+        trainer_disables_channels_last = self.extra_args.get("sync_batchnorm", False) or (
+            strategy == "dp" or isinstance(strategy, DataParallelStrategy)
+        )
+        self.use_channels_last = (
+            not no_channel_last
+            and not trainer_disables_channels_last
+            and _should_use_channels_last(self.backbone)
+        )
+        if self.use_channels_last:
             self = self.to(memory_format=torch.channels_last)
 
+        # classifier, loss and accuracies always have the same shapes, so they can be compiled
+        self._head_step = self._head_impl
+        if compile_head:
+            assert hasattr(torch, "compile"), "Compiling the classifier requires torch>=2.0."
+            self._head_step = torch.compile(self._head_impl)
+
     @staticmethod
     def add_model_specific_args(parent_parser: ArgumentParser) -> ArgumentParser:
         """Adds basic linear arguments.
@@ -171,6 +302,8 @@ class LinearModel(pl.LightningModule):
         parser.add_argument("--lr", type=float, default=0.3)
         parser.add_argument("--classifier_lr", type=float, default=0.3)
         parser.add_argument("--weight_decay", type=float, default=0.0001)
+        # linear eval with a frozen backbone is usually bottlenecked by data loading,
+        # so use enough workers and keep them persistent (see on_train_start)
         parser.add_argument("--num_workers", type=int, default=4)
 
         # wandb
@@ -204,8 +337,42 @@ class LinearModel(pl.LightningModule):
         # disables channel last optimization
         parser.add_argument("--no_channel_last", action="store_true")
 
+        # compiles the classifier and the loss with torch.compile
+        parser.add_argument("--compile_head", action="store_true")
+
+        # quantizes the frozen backbone to int8 when training on cpu
+        parser.add_argument("--quantize_backbone", action="store_true")
+
+        # runs the frozen backbone in bf16 on gpus that support it
+        parser.add_argument("--backbone_bf16", action="store_true")
+
+        # extracts the features of the frozen backbone once and trains only the classifier
+        parser.add_argument("--cache_features", action="store_true")
+        # stores the features in .npy files, which are reused if they already exist
+        parser.add_argument("--features_cache_dir", default=None, type=str)
+
         return parent_parser
 
+    def _compute_scheduler_lengths(self) -> Tuple[float, float]:
+        """Computes the number of warmup and total steps (or epochs) of the scheduler.
+        Estimating the number of stepping batches might require going through the
+        dataloaders, so the result is reused while the trainer and the scheduler
+        settings stay the same.
+
+        Returns:
+            Tuple[float, float]: number of warmup steps and total number of steps.
+        """
+
+        key = (id(self.trainer), self.max_epochs, self.warmup_epochs, self.scheduler_interval)
+        if self._sched_lengths is None or self._sched_lengths[0] != key:
+            if self.scheduler_interval == "step":
+                total_steps = self.trainer.estimated_stepping_batches
+                lengths = (self.warmup_epochs * (total_steps / self.max_epochs), total_steps)
+            else:
+                lengths = (self.warmup_epochs, self.max_epochs)
+            self._sched_lengths = (key, lengths)
+        return self._sched_lengths[1]
+
     def configure_optimizers(self) -> Tuple[List, List]:
         """Configures the optimizer for the linear layer.
 
@@ -218,32 +385,35 @@ class LinearModel(pl.LightningModule):
             Tuple[List, List]: two lists containing the optimizer and the scheduler.
         """
 
+        # already checked in __init__, but the optimizer can still be changed afterwards
         assert self.optimizer in self._OPTIMIZERS
         optimizer = self._OPTIMIZERS[self.optimizer]
 
+        exclude_bias_n_norm_wd = self.extra_args.get("exclude_bias_n_norm_wd", False)
+        classifier_params = [{"name": "classifier", "params": self.classifier.parameters()}]
+        # exclude bias and norm from weight decay
+        if exclude_bias_n_norm_wd:
+            classifier_params = remove_bias_and_norm_from_weight_decay(classifier_params)
+
         layer_decay = self.extra_args.get("layer_decay", 0)
         if layer_decay > 0:
             assert self.finetune, "Only with use layer weight decay with finetune on."
+            # bias and norm parameters are already excluded from weight decay here,
+            # so there is no need to go through the backbone parameters again
             learnable_params = param_groups_layer_decay(
                 self.backbone,
                 self.weight_decay,
                 no_weight_decay_list=self.backbone.no_weight_decay(),
                 layer_decay=layer_decay,
             )
-            learnable_params.append({"name": "classifier", "params": self.classifier.parameters()})
+        elif self.finetune:
+            learnable_params = [{"name": "backbone", "params": self.backbone.parameters()}]
+            # exclude bias and norm from weight decay
+            if exclude_bias_n_norm_wd:
+                learnable_params = remove_bias_and_norm_from_weight_decay(learnable_params)
         else:
-            learnable_params = (
-                self.classifier.parameters()
-                if not self.finetune
-                else [
-                    {"name": "backbone", "params": self.backbone.parameters()},
-                    {"name": "classifier", "params": self.classifier.parameters()},
-                ]
-            )
-
-        # exclude bias and norm from weight decay
-        if self.extra_args.get("exclude_bias_n_norm_wd", False):
-            learnable_params = remove_bias_and_norm_from_weight_decay(learnable_params)
+            learnable_params = []
+        learnable_params.extend(classifier_params)
 
         optimizer = optimizer(
             learnable_params,
@@ -257,16 +427,7 @@ class LinearModel(pl.LightningModule):
             return optimizer
 
         if self.scheduler == "warmup_cosine":
-            max_warmup_steps = (
-                self.warmup_epochs * (self.trainer.estimated_stepping_batches / self.max_epochs)
-                if self.scheduler_interval == "step"
-                else self.warmup_epochs
-            )
-            max_scheduler_steps = (
-                self.trainer.estimated_stepping_batches
-                if self.scheduler_interval == "step"
-                else self.max_epochs
-            )
+            max_warmup_steps, max_scheduler_steps = self._compute_scheduler_lengths()
             scheduler = {
                 "scheduler": LinearWarmupCosineAnnealingLR(
                     optimizer,
@@ -279,7 +440,13 @@ class LinearModel(pl.LightningModule):
                 "frequency": 1,
             }
         elif self.scheduler == "reduce":
-            scheduler = ReduceLROnPlateau(optimizer)
+            # val_loss is only computed once per epoch in validation_epoch_end
+            scheduler = {
+                "scheduler": ReduceLROnPlateau(optimizer, mode="min"),
+                "monitor": "val_loss",
+                "interval": "epoch",
+                "frequency": 1,
+            }
         elif self.scheduler == "step":
             scheduler = MultiStepLR(optimizer, self.lr_decay_steps, gamma=0.1)
         elif self.scheduler == "exponential":
@@ -291,24 +458,257 @@ class LinearModel(pl.LightningModule):
 
         return [optimizer], [scheduler]
 
-    def forward(self, X: torch.tensor) -> Dict[str, Any]:
-        """Performs forward pass of the frozen backbone and the linear layer for evaluation.
+    def precompute_features(
+        self, dataloader: DataLoader, cache_file: Optional[str] = None
+    ) -> TensorDataset:
+        """Runs the frozen backbone once over all the data of a dataloader, so that the following
+        epochs only need to train the linear layer. Since the backbone is frozen, its outputs
+        are deterministic for the same inputs and there is no need to recompute them every epoch.
 
         Args:
-            X (torch.tensor): a batch of images in the tensor format.
+            dataloader (DataLoader): dataloader that yields batches of images and targets.
+            cache_file (Optional[str], optional): if provided, features and targets are stored in
+                memory-mapped .npy files with this prefix instead of being kept in memory.
+                If these files already exist, they are loaded instead of extracting the features
+                again, so they need to be deleted when the backbone or the data changes.
+                Defaults to None.
 
         Returns:
-            Dict[str, Any]: a dict containing features and logits.
+            TensorDataset: dataset of precomputed features and targets.
         """
 
-        if not self.no_channel_last:
-            X = X.to(memory_format=torch.channels_last)
+        assert not self.finetune, "Features can only be cached when the backbone is frozen."
+        assert self.mixup_func is None, "Features cannot be cached when using mixup/cutmix."
+
+        if cache_file is not None:
+            feats_file = f"{cache_file}_feats.npy"
+            targets_file = f"{cache_file}_targets.npy"
+            if os.path.exists(feats_file) and os.path.exists(targets_file):
+                logging.info(f"Loading cached features from {feats_file}")
+                return self._load_cached_features(feats_file, targets_file)
+
+            assert not dataloader.drop_last, "All samples are needed to cache the features."
+
+        num_samples = len(dataloader.dataset)
+        if cache_file is not None:
+            feats = np.lib.format.open_memmap(
+                feats_file, mode="w+", dtype=np.float32, shape=(num_samples, self.features_dim)
+            )
+            targets = np.lib.format.open_memmap(
+                targets_file, mode="w+", dtype=np.int64, shape=(num_samples,)
+            )
+        else:
+            feats = np.empty((num_samples, self.features_dim), dtype=np.float32)
+            targets = np.empty((num_samples,), dtype=np.int64)
+
+        self._maybe_quantize_backbone()
+        self.backbone.eval()
+        n = 0
+        with torch.inference_mode():
+            for X, target in dataloader:
+                X = X.to(self.device, non_blocking=True)
+                if self.use_channels_last:
+                    X = X.to(memory_format=torch.channels_last)
+
+                batch_feats = self._frozen_backbone_forward(X)
+                b = batch_feats.size(0)
+                feats[n : n + b] = batch_feats.float().cpu().numpy()
+                targets[n : n + b] = target.numpy()
+                n += b
+
+        if cache_file is not None:
+            feats.flush()
+            targets.flush()
+            del feats, targets
+            return self._load_cached_features(feats_file, targets_file)
+
+        return TensorDataset(torch.from_numpy(feats[:n]), torch.from_numpy(targets[:n]))
+
+    @staticmethod
+    def _load_cached_features(feats_file: str, targets_file: str) -> TensorDataset:
+        """Loads features and targets cached by precompute_features. The files are opened in
+        copy-on-write mode, so they are never modified after being written.
+
+        Args:
+            feats_file (str): path to the .npy file with the features.
+            targets_file (str): path to the .npy file with the targets.
+
+        Returns:
+            TensorDataset: dataset of precomputed features and targets.
+        """
 
-        with torch.set_grad_enabled(self.finetune):
+        feats = np.load(feats_file, mmap_mode="c")
+        targets = np.load(targets_file, mmap_mode="c")
+        return TensorDataset(torch.from_numpy(feats), torch.from_numpy(targets))
+
+    def train(self, mode: bool = True) -> "LinearModel":
+        """Sets the module in training or evaluation mode, but keeps frozen backbones in
+        evaluation mode, so that their BatchNorm statistics are never updated.
+
+        Args:
+            mode (bool): whether to set training mode (True) or evaluation mode (False).
+                Defaults to True.
+
+        Returns:
+            LinearModel: self.
+        """
+
+        super().train(mode)
+        if not self.finetune:
+            self.backbone.eval()
+        return self
+
+    def on_train_start(self):
+        """Warns if the training dataloader recreates its workers every epoch. The frozen
+        backbone makes each step cheap, so data loading is usually the bottleneck and forking
+        the workers again at every epoch becomes noticeable."""
+
+        loader = getattr(self.trainer.train_dataloader, "loaders", None)
+        if isinstance(loader, DataLoader) and loader.num_workers > 0:
+            if not loader.persistent_workers:
+                logging.warn(
+                    "The training dataloader does not use persistent workers, "
+                    "which might slow down linear evaluation."
+                )
+
+    def on_fit_start(self):
+        """Updates the bf16 and channels last flags, since the trainer might have converted the
+        backbone's BatchNorm layers to SyncBatchNorm. Channels last is also disabled with
+        DataParallel, which only benefits from it with DDP."""
+
+        has_sync_bn = _has_sync_batchnorm(self.backbone)
+        self._backbone_bf16 = self.backbone_bf16 and not self.finetune and not has_sync_bn
+        if self._backbone_bf16 and self.device.type == "cuda" and torch.cuda.is_bf16_supported():
+            logging.info("Running the frozen backbone in bf16.")
+
+        if self.use_channels_last and (
+            has_sync_bn or isinstance(self.trainer.strategy, DataParallelStrategy)
+        ):
+            self.use_channels_last = False
+            self.to(memory_format=torch.contiguous_format)
+
+        self._maybe_quantize_backbone()
+
+    def _maybe_quantize_backbone(self):
+        """Dynamically quantizes the linear layers of the frozen backbone to int8 if required
+        and the model is on CPU, where fbgemm/qnnpack int8 kernels are much faster than fp32.
+        Convolutions are left untouched, since they do not support dynamic quantization."""
+
+        if self.quantize_backbone and not self._backbone_quantized and self.device.type == "cpu":
+            num_linear = sum(isinstance(m, nn.Linear) for m in self.backbone.modules())
+            if num_linear == 0:
+                logging.warn(
+                    "The backbone has no linear layers, so it was not quantized "
+                    "and will keep running in fp32."
+                )
+            else:
+                torch.ao.quantization.quantize_dynamic(
+                    self.backbone, {nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+                logging.info(f"Quantized {num_linear} linear layers of the backbone to int8.")
+            self._backbone_quantized = True
+
+    def _frozen_backbone_forward(self, X: torch.Tensor) -> torch.Tensor:
+        """Performs the forward pass of the frozen backbone with inference mode, which also
+        skips view tracking and version counter bumps. If backbone_bf16 is set, it also runs
+        in bf16 when on a GPU that supports it.
+
+        Args:
+            X (torch.Tensor): a batch of images in the tensor format.
+
+        Returns:
+            torch.Tensor: fp32 features of the backbone.
+        """
+
+        use_bf16 = self._backbone_bf16 and X.is_cuda and torch.cuda.is_bf16_supported()
+        # only enter autocast when bf16 is requested, otherwise the trainer's precision applies
+        autocast = (
+            torch.autocast("cuda", dtype=torch.bfloat16) if use_bf16 else contextlib.nullcontext()
+        )
+        with torch.inference_mode(), autocast:
             feats = self.backbone(X)
 
+        # inference tensors cannot be saved for backward, so copy them back to a normal tensor
+        return feats.to(torch.float32, copy=True)
+
+    def optimizer_zero_grad(self, epoch, batch_idx, optimizer, optimizer_idx):
+        """
+        This improves performance marginally. It should be fine
+        since we are not affected by any of the downsides descrited in
+        https://pytorch.org/docs/stable/generated/torch.optim.Optimizer.zero_grad.html#torch.optim.Optimizer.zero_grad
+
+        Implemented as in here
+        https://pytorch-lightning.readthedocs.io/en/1.5.10/guides/speed.html#set-grads-to-none
+        """
+        try:
+            optimizer.zero_grad(set_to_none=True)
+        except:
+            optimizer.zero_grad()
+
+    def _forward_features(self, X: torch.Tensor) -> torch.Tensor:
+        """Extracts the features of a batch with the backbone. If features_cached is set, X is a
+        batch of precomputed features (see precompute_features) and the backbone is skipped.
+
+        Args:
+            X (torch.Tensor): a batch of images or precomputed features in the tensor format.
+
+        Returns:
+            torch.Tensor: features of the batch.
+        """
+
+        if self.features_cached:
+            assert (
+                X.ndim == 2 and X.size(1) == self.features_dim
+            ), f"Expected cached features of size (N, {self.features_dim}), got {tuple(X.size())}."
+            return X
+
+        # the dataloader might already provide channels last images
+        if self.use_channels_last and not X.is_contiguous(memory_format=torch.channels_last):
+            X = X.to(memory_format=torch.channels_last)
+
+        if self.finetune:
+            return self.backbone(X)
+        return self._frozen_backbone_forward(X)
+
+    def _head_impl(
+        self, feats: torch.Tensor, target: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Computes the logits of the classifier, the loss and the accuracies.
+
+        Args:
+            feats (torch.Tensor): features of the batch.
+            target (torch.Tensor): ground truth labels.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+                logits, loss, accuracy @1 and accuracy @5.
+        """
+
+        logits = self.classifier(feats)
+        loss, acc1, acc5 = _loss_and_topk(logits, target)
+        return logits, loss, acc1, acc5
+
+    def forward(
+        self, X: torch.tensor, return_feats: bool = False
+    ) -> Union[torch.Tensor, Dict[str, Any]]:
+        """Performs forward pass of the frozen backbone and the linear layer for evaluation.
+        If features_cached is set, X is a batch of precomputed features (see precompute_features)
+        and the backbone is skipped.
+
+        Args:
+            X (torch.tensor): a batch of images or precomputed features in the tensor format.
+            return_feats (bool): whether to also return the features. Defaults to False.
+
+        Returns:
+            Union[torch.Tensor, Dict[str, Any]]: the logits or, if return_feats is True,
+                a dict containing features and logits.
+        """
+
+        feats = self._forward_features(X)
         logits = self.classifier(feats)
-        return {"logits": logits, "feats": feats}
+        if return_feats:
+            return {"logits": logits, "feats": feats}
+        return logits
 
     def shared_step(
         self, batch: Tuple, batch_idx: int
@@ -329,18 +729,18 @@ class LinearModel(pl.LightningModule):
         metrics = {"batch_size": X.size(0)}
         if self.training and self.mixup_func is not None:
             X, target = self.mixup_func(X, target)
-            out = self(X)["logits"]
-            loss = self.loss_func(out, target)
-            metrics.update({"loss": loss})
-        else:
-            out = self(X)["logits"]
-            loss = F.cross_entropy(out, target)
-            acc1, acc5 = accuracy_at_k(out, target, top_k=(1, 5))
-            metrics.update({"loss": loss, "acc1": acc1, "acc5": acc5})
+
+        feats = self._forward_features(X)
+        logits, loss, acc1, acc5 = self._head_step(feats, target)
+        # validation always uses the plain cross-entropy
+        if self.training and not self._fused_loss:
+            loss = self.loss_func(logits, target)
+        # metrics are kept as tensors on the device and only reduced at the end of the epoch
+        metrics.update({"loss": loss, "acc1": acc1, "acc5": acc5})
 
         return metrics
 
-    def training_step(self, batch: torch.Tensor, batch_idx: int) -> torch.Tensor:
+    def training_step(self, batch: torch.Tensor, batch_idx: int) -> Dict[str, Any]:
         """Performs the training step for the linear eval.
 
         Args:
@@ -348,21 +748,31 @@ class LinearModel(pl.LightningModule):
             batch_idx (int): the index of the batch.
 
         Returns:
-            torch.Tensor: cross-entropy loss between the predictions and the ground truth.
+            Dict[str, Any]:
+                dict with the batch_size (used for averaging), the cross-entropy loss between
+                the predictions and the ground truth and the accuracies.
         """
 
-        # set backbone to eval mode
-        if not self.finetune:
-            self.backbone.eval()
-
         out = self.shared_step(batch, batch_idx)
 
-        log = {"train_loss": out["loss"]}
-        if self.mixup_func is None:
-            log.update({"train_acc1": out["acc1"], "train_acc5": out["acc5"]})
+        # epoch metrics are only synchronized in training_epoch_end
+        self.log("train_loss_step", out["loss"], on_step=True, on_epoch=False, prog_bar=True)
+        return out
 
-        self.log_dict(log, on_epoch=True, sync_dist=True)
-        return out["loss"]
+    def training_epoch_end(self, outs: List[Dict[str, Any]]):
+        """Averages the losses and accuracies of all the training batches. This is done once
+        per epoch, avoiding synchronizing all the metrics across devices at every step.
+
+        Args:
+            outs (List[Dict[str, Any]]): list of outputs of the training step.
+        """
+
+        train_loss, train_acc1, train_acc5 = weighted_means(
+            outs, ["loss", "acc1", "acc5"], "batch_size"
+        )
+        log = {"train_loss": train_loss, "train_acc1": train_acc1, "train_acc5": train_acc5}
+
+        self.log_dict(log, sync_dist=True)
 
     def validation_step(self, batch: torch.Tensor, batch_idx: int) -> Dict[str, Any]:
         """Performs the validation step for the linear eval.
@@ -396,9 +806,9 @@ class LinearModel(pl.LightningModule):
             outs (List[Dict[str, Any]]): list of outputs of the validation step.
         """
 
-        val_loss = weighted_mean(outs, "val_loss", "batch_size")
-        val_acc1 = weighted_mean(outs, "val_acc1", "batch_size")
-        val_acc5 = weighted_mean(outs, "val_acc5", "batch_size")
+        val_loss, val_acc1, val_acc5 = weighted_means(
+            outs, ["val_loss", "val_acc1", "val_acc5"], "batch_size"
+        )
 
         log = {"val_loss": val_loss, "val_acc1": val_acc1, "val_acc5": val_acc5}
         self.log_dict(log, sync_dist=True)
@@ -52,8 +52,9 @@ def accuracy_at_k(
         return res
 
 
-def weighted_mean(outputs: List[Dict], key: str, batch_size_key: str) -> float:
+def weighted_mean(outputs: List[Dict], key: str, batch_size_key: str) -> torch.Tensor:
     """Computes the mean of the values of a key weighted by the batch size.
+    The values are reduced on their device, so no host synchronization is needed.
 
     Args:
         outputs (List[Dict]): list of dicts containing the outputs of a validation step.
@@ -61,13 +62,36 @@ def weighted_mean(outputs: List[Dict], key: str, batch_size_key: str) -> float:
         batch_size_key (str): key of batch size values.
 
     Returns:
-        float: weighted mean of the values of a key
+        torch.Tensor: weighted mean of the values of a key
     """
 
-    value = 0
-    n = 0
-    for out in outputs:
-        value += out[batch_size_key] * out[key]
-        n += out[batch_size_key]
+    value = torch.stack([out[batch_size_key] * out[key] for out in outputs]).sum(0)
+    n = sum(out[batch_size_key] for out in outputs)
     value = value / n
     return value.squeeze(0)
+
+
+def weighted_means(
+    outputs: List[Dict], keys: Sequence[str], batch_size_key: str
+) -> List[torch.Tensor]:
+    """Computes the means of the values of several keys weighted by the batch size.
+    Instead of iterating over the outputs once per key, all values are stacked into a single
+    tensor and reduced at once.
+
+    Args:
+        outputs (List[Dict]): list of dicts containing the outputs of a validation step.
+        keys (Sequence[str]): keys of the metrics of interest.
+        batch_size_key (str): key of batch size values.
+
+    Returns:
+        List[torch.Tensor]: weighted means of the values of each key.
+    """
+
+    values = torch.stack(
+        [torch.cat([out[key].detach().reshape(-1) for key in keys]) for out in outputs]
+    ).float()
+    weights = torch.tensor(
+        [out[batch_size_key] for out in outputs], dtype=values.dtype, device=values.device
+    )
+    means = (values * weights.unsqueeze(1)).sum(0) / weights.sum()
+    return list(means.unbind())
@@ -373,8 +373,8 @@ def param_groups_layer_decay(
         if not param.requires_grad:
             continue
 
-        # no decay: all 1D parameters and model specific ones
-        if param.ndim == 1 or name in no_weight_decay_list:
+        # no decay: all 1D (bias and norm) parameters and model specific ones
+        if param.ndim <= 1 or name in no_weight_decay_list:
             g_decay = "no_decay"
             this_decay = 0.0
         else:
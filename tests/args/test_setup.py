@@ -431,6 +431,28 @@ def test_additional_setup_linear():
     assert "momentum" in args.extra_optimizer_args
     assert isinstance(args.devices, list)
 
+    # check that adam also gets the betas
+    args = {
+        "backbone": "resnet18",
+        "dataset": "imagenet100",
+        "data_format": "dali",
+        "optimizer": "adam",
+        "adamw_beta1": 0.8,
+        "adamw_beta2": 0.99,
+        "devices": "0,",
+        "lr": 0.1,
+        "batch_size": 128,
+        "zero_init_residual": False,
+        "strategy": None,
+        "num_nodes": 1,
+    }
+    args = argparse.Namespace(**args)
+
+    additional_setup_linear(args)
+
+    assert args.extra_optimizer_args["betas"] == [0.8, 0.99]
+    assert not hasattr(args, "adamw_beta1") and not hasattr(args, "adamw_beta2")
+
     # check for different backbone / custom dataset
     with DummyDataset("dummy_train", "dummy_val", 10, 4):
         args = {
@@ -22,8 +22,11 @@ import argparse
 import pytest
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 from pytorch_lightning import Trainer
-from solo.methods.linear import LinearModel
+from solo.methods.linear import LinearModel, _loss_and_topk
+from solo.utils.metrics import accuracy_at_k
+from torch.utils.data import DataLoader, Subset, TensorDataset
 from torchvision.models import resnet18
 
 from .utils import (
@@ -51,7 +54,12 @@ def test_linear():
         BASE_KWARGS["batch_size"], BASE_KWARGS["num_classes"], "imagenet100"
     )
     out = model(batch[0])
+    assert isinstance(out, torch.Tensor) and out.size() == (
+        BASE_KWARGS["batch_size"],
+        BASE_KWARGS["num_classes"],
+    )
 
+    out = model(batch[0], return_feats=True)
     assert (
         "logits" in out
         and isinstance(out["logits"], torch.Tensor)
@@ -74,9 +82,26 @@ def test_linear():
         "imagenet100",
         num_classes=BASE_KWARGS["num_classes"],
     )
+    running_mean = model.backbone.bn1.running_mean.clone()
     trainer.fit(model, train_dl, val_dl)
 
+    # frozen backbone is kept in eval mode, so its BatchNorm statistics are not updated
+    model.train()
+    assert not model.backbone.training and model.classifier.training
+    assert torch.equal(model.backbone.bn1.running_mean, running_mean)
+
+    # test feature caching
+    feats_dl = DataLoader(Subset(val_dl.dataset, range(4)), batch_size=2)
+    feats, targets = model.precompute_features(feats_dl).tensors
+    assert feats.size() == (4, model.features_dim) and targets.size() == (4,)
+    model.features_cached = True
+    assert model(feats).size() == (4, BASE_KWARGS["num_classes"])
+    model.features_cached = False
+
     # test optimizers/scheduler
+    with pytest.raises(AssertionError):
+        LinearModel(model.backbone, nn.CrossEntropyLoss(), **{**kwargs, "optimizer": "random"})
+
     model.optimizer = "random"
     model.scheduler = "none"
     with pytest.raises(AssertionError):
@@ -89,7 +114,8 @@ def test_linear():
 
     model.scheduler = "reduce"
     scheduler = model.configure_optimizers()[1][0]
-    assert isinstance(scheduler, torch.optim.lr_scheduler.ReduceLROnPlateau)
+    assert isinstance(scheduler["scheduler"], torch.optim.lr_scheduler.ReduceLROnPlateau)
+    assert scheduler["monitor"] == "val_loss" and scheduler["interval"] == "epoch"
 
     model.scheduler = "step"
     scheduler = model.configure_optimizers()[1][0]
@@ -108,3 +134,123 @@ def test_linear():
     model.extra_optimizer_args = {}
     optimizer = model.configure_optimizers()
     assert isinstance(optimizer, torch.optim.Optimizer)
+
+    # test excluding bias and norm from weight decay
+    model.extra_args["exclude_bias_n_norm_wd"] = True
+    for finetune in [False, True]:
+        model.finetune = finetune
+        optimizer = model.configure_optimizers()
+        no_decay_params = [
+            p
+            for group in optimizer.param_groups
+            if group["weight_decay"] == 0
+            for p in group["params"]
+        ]
+        assert any(p is model.classifier.bias for p in no_decay_params)
+        assert any(p is model.backbone.bn1.bias for p in no_decay_params) == finetune
+    model.finetune = False
+
+
+def test_linear_accumulate_grad_batches():
+    BASE_KWARGS = gen_base_kwargs(cifar=False)
+    kwargs = {**BASE_KWARGS, **DATA_KWARGS}
+    kwargs.pop("backbone")
+    kwargs["accumulate_grad_batches"] = 4
+    kwargs["min_lr"] = 0.001
+    kwargs["warmup_start_lr"] = 0.002
+    backbone = resnet18()
+    backbone.fc = nn.Identity()
+    model = LinearModel(backbone, nn.CrossEntropyLoss(), **kwargs)
+
+    assert model.lr == pytest.approx(kwargs["lr"] * 4)
+    assert model.min_lr == pytest.approx(kwargs["min_lr"] * 4)
+    assert model.warmup_start_lr == pytest.approx(kwargs["warmup_start_lr"] * 4)
+
+
+def test_linear_feature_cache(tmp_path):
+    BASE_KWARGS = gen_base_kwargs(cifar=False)
+    kwargs = {**BASE_KWARGS, **DATA_KWARGS}
+    backbone = resnet18()
+    backbone.fc = nn.Identity()
+    kwargs.pop("backbone")
+    model = LinearModel(backbone, nn.CrossEntropyLoss(), **kwargs)
+
+    _, val_dl = prepare_classification_dummy_dataloaders(
+        "imagenet100",
+        num_classes=BASE_KWARGS["num_classes"],
+    )
+    feats_dl = DataLoader(Subset(val_dl.dataset, range(4)), batch_size=2)
+    cache_file = str(tmp_path / "train")
+
+    feats, targets = model.precompute_features(feats_dl, cache_file).tensors
+    assert (tmp_path / "train_feats.npy").exists() and (tmp_path / "train_targets.npy").exists()
+    assert feats.size() == (4, model.features_dim) and targets.size() == (4,)
+
+    # existing files are loaded instead of extracting the features again
+    cached_feats, cached_targets = model.precompute_features(feats_dl, cache_file).tensors
+    assert torch.equal(feats, cached_feats) and torch.equal(targets, cached_targets)
+    model.features_cached = True
+    assert model(cached_feats).size() == (4, BASE_KWARGS["num_classes"])
+
+
+def test_linear_quantize_backbone():
+    BASE_KWARGS = gen_base_kwargs(cifar=False)
+    kwargs = {**BASE_KWARGS, **DATA_KWARGS}
+    backbone = nn.Sequential(nn.Linear(32, 64), nn.ReLU(), nn.Linear(64, 16))
+    backbone.num_features = 16
+    kwargs.pop("backbone")
+    model = LinearModel(backbone, nn.CrossEntropyLoss(), quantize_backbone=True, **kwargs)
+
+    dataset = TensorDataset(torch.randn(4, 32), torch.randint(0, BASE_KWARGS["num_classes"], (4,)))
+    feats, _ = model.precompute_features(DataLoader(dataset, batch_size=2)).tensors
+    assert feats.size() == (4, 16)
+
+    quantized = [
+        m for m in model.backbone.modules() if isinstance(m, torch.ao.nn.quantized.dynamic.Linear)
+    ]
+    assert len(quantized) == 2
+
+    # 2D inputs still go through the backbone unless the features were cached
+    assert model(torch.randn(2, 32)).size() == (2, BASE_KWARGS["num_classes"])
+
+
+def test_linear_frozen_backbone_autocast():
+    BASE_KWARGS = gen_base_kwargs(cifar=False)
+    kwargs = {**BASE_KWARGS, **DATA_KWARGS}
+    backbone = resnet18()
+    backbone.fc = nn.Identity()
+    kwargs.pop("backbone")
+    model = LinearModel(backbone, nn.CrossEntropyLoss(), **kwargs)
+
+    if torch.cuda.is_available():
+        device, dtype = "cuda", torch.float16
+    else:
+        device, dtype = "cpu", torch.bfloat16
+    model.to(device)
+
+    # the backbone must follow the trainer's autocast when backbone_bf16 is not set
+    backbone_dtypes = []
+    model.backbone.register_forward_hook(lambda m, i, o: backbone_dtypes.append(o.dtype))
+    X = torch.randn(2, 3, 32, 32, device=device)
+    with torch.autocast(device, dtype=dtype):
+        feats = model._frozen_backbone_forward(X)
+
+    assert backbone_dtypes == [dtype]
+    assert feats.dtype == torch.float32
+
+
+def test_loss_and_topk():
+    b, c = 32, 100
+    logits = torch.randn(b, c)
+    target = torch.randint(low=0, high=c, size=(b,))
+
+    loss, acc1, acc5 = _loss_and_topk(logits, target)
+    ref_acc1, ref_acc5 = accuracy_at_k(logits, target, top_k=(1, 5))
+
+    assert torch.allclose(loss, F.cross_entropy(logits, target))
+    assert torch.allclose(acc1, ref_acc1) and torch.allclose(acc5, ref_acc5)
+
+    # soft targets
+    soft_loss, soft_acc1, soft_acc5 = _loss_and_topk(logits, F.one_hot(target, c).float())
+    assert torch.allclose(loss, soft_loss)
+    assert torch.allclose(acc1, soft_acc1) and torch.allclose(acc5, soft_acc5)
@@ -20,8 +20,14 @@
 import math
 
 import numpy as np
+import torch
 from PIL import Image
-from solo.data.classification_dataloader import prepare_data, prepare_datasets, prepare_transforms
+from solo.data.classification_dataloader import (
+    channels_last_collate,
+    prepare_data,
+    prepare_datasets,
+    prepare_transforms,
+)
 from torch.utils.data import DataLoader
 from torchvision.datasets import CIFAR10
 
@@ -71,3 +77,11 @@ def test_data():
     assert isinstance(val_loader, DataLoader)
     assert num_batches_train == len(train_loader)
     assert num_batches_val == len(val_loader)
+
+
+def test_channels_last_collate():
+    batch = [(torch.randn(3, 32, 32), i) for i in range(4)]
+    X, targets = channels_last_collate(batch)
+    assert X.size() == (4, 3, 32, 32)
+    assert X.is_contiguous(memory_format=torch.channels_last)
+    assert torch.equal(targets, torch.arange(4))
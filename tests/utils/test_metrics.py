@@ -18,7 +18,7 @@
 # DEALINGS IN THE SOFTWARE.
 
 import torch
-from solo.utils.metrics import accuracy_at_k
+from solo.utils.metrics import accuracy_at_k, weighted_mean, weighted_means
 
 
 def test_accuracy_at_k():
@@ -29,3 +29,14 @@ def test_accuracy_at_k():
 
     assert isinstance(acc1, torch.Tensor)
     assert isinstance(acc5, torch.Tensor)
+
+
+def test_weighted_means():
+    outs = [
+        {"batch_size": b, "loss": torch.rand(()), "acc1": torch.rand(1) * 100}
+        for b in [32, 32, 7]
+    ]
+    loss, acc1 = weighted_means(outs, ["loss", "acc1"], "batch_size")
+
+    assert torch.allclose(loss, weighted_mean(outs, "loss", "batch_size"))
+    assert torch.allclose(acc1, weighted_mean(outs, "acc1", "batch_size"))